@@ -3,43 +3,91 @@ import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 from datetime import datetime, timezone, timedelta
 import re
+import string
+import time
+import threading
+from collections import Counter
 from streamlit_autorefresh import st_autorefresh
 from gspread.exceptions import GSpreadException
+from gspread.utils import ValueRenderOption, fill_gaps, rowcol_to_a1
 import streamlit.components.v1 as components
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # =============================
 # ===== CONFIGURATION =====
 # =============================
 SHEET_NAME = "Event_Seats"
+SHEET_ID = ""  # optional spreadsheet key (from its URL); skips the Drive search by name
 SEATS_WS_NAME = "Seats"
+SEATS_RANGE = "A:G"  # SeatID, Section, Row, Col, Status, ReservedBy, PhoneNo
 WHITELIST_WS_NAME = "Whitelist"
 
 # Malaysia = UTC+8
 MYT = timezone(timedelta(hours=8))
 OPEN_AT = datetime(2025, 9, 22, 8, 0, 0, tzinfo=MYT)   # <<< your opening time
 CUTOFF_DATETIME = datetime(2025, 10, 31, 23, 59, 59, tzinfo=MYT)
-AUTO_REFRESH_MS_BEFORE = 1000  # 1s refresh before open (countdown)
-AUTO_REFRESH_MS_AFTER  = 2000  # 2s refresh after open (live seat updates)
+# Epoch seconds, so the per-rerun gates are plain float compares
+OPEN_TS = OPEN_AT.timestamp()
+CUTOFF_TS = CUTOFF_DATETIME.timestamp()
+# Before open the countdown runs in the browser (JS); the server only
+# reruns once near open. Cap that one-shot timer below the browser timer
+# limit (~24.8 days) so very long waits don't overflow and fire immediately.
+PREOPEN_MAX_REFRESH_SEC = 24 * 24 * 3600
+# Per-request Sheets timeout (gspread's default is none) and retries of
+# idempotent (GET) requests on transient errors
+SHEETS_TIMEOUT_SEC = 10
+SHEETS_RETRIES = 1
+# Longest a confirm waits for another session's check-and-write. The holder
+# does one retried GET + one POST (POSTs are never retried), so this covers
+# its worst case and a slow holder doesn't make every other confirm "busy"
+BOOKING_LOCK_TIMEOUT_SEC = (SHEETS_RETRIES + 2) * SHEETS_TIMEOUT_SEC + 10  # GET tries + POST + slack
+
+# Must be the first Streamlit command: the cached sheet loaders below emit
+# a spinner element, and an error there renders st.error
+st.set_page_config(page_title="Seat Selection", layout="wide")
 
 # =====================
 # ====== AUTH =========
 # =====================
 scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
 
-# Load service account from Streamlit secrets
-creds_dict = st.secrets["gcp_service_account"]
-
-# Create credentials object
-creds = ServiceAccountCredentials.from_json_keyfile_dict(dict(creds_dict), scope)
-
-# Authorize with Google Sheets
-client = gspread.authorize(creds)
+@st.cache_resource
+def gspread_client():
+    """Parse the service account key + build the HTTP session once per process."""
+    # Load service account from Streamlit secrets
+    creds_dict = st.secrets["gcp_service_account"]
+
+    # Create credentials object
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(dict(creds_dict), scope)
+
+    # Authorize with Google Sheets
+    client = gspread.authorize(creds)
+    client.set_timeout(SHEETS_TIMEOUT_SEC)
+
+    # gspread keeps one authorized requests session; size its connection pool
+    # for many concurrent users (keep-alive, no TLS handshake per call) and
+    # retry transient errors / rate limits on idempotent requests
+    client.http_client.session.mount("https://", HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        # Retry-After is not honoured: a rate-limit wait would hold booking_lock()
+        max_retries=Retry(total=SHEETS_RETRIES, backoff_factor=0.3,
+                          status_forcelist=[429, 500, 502, 503, 504],
+                          respect_retry_after_header=False),
+    ))
+    return client
+
+@st.cache_resource
+def get_worksheets():
+    """Open the sheet once per process (shared by all sessions)."""
+    client = gspread_client()
+    sh = client.open_by_key(SHEET_ID) if SHEET_ID else client.open(SHEET_NAME)
+    return sh, sh.worksheet(SEATS_WS_NAME), sh.worksheet(WHITELIST_WS_NAME)
 
 try:
-    sh = client.open(SHEET_NAME)
-    seats_ws = sh.worksheet(SEATS_WS_NAME)
-    wl_ws    = sh.worksheet(WHITELIST_WS_NAME)
-    
+    sh, seats_ws, wl_ws = get_worksheets()
+
 except Exception as e:
     st.error(f"⚠️ Could not open Google Sheet/worksheets. Details: {e}")
     st.stop()
@@ -47,7 +95,8 @@ except Exception as e:
 # =========================
 # ====== UI THEME =========
 # =========================
-st.set_page_config(page_title="Seat Selection", layout="wide")
+# The watermark logo is served from static/ (enableStaticServing), so the
+# browser caches it
 st.markdown(
     """
     <style>
@@ -58,7 +107,7 @@ st.markdown(
         left: 0;
         width: 100%;
         height: 100%;
-        background-image: url("logo.png");
+        background-image: url("app/static/logo.png");
         background-size: 400px;
         background-repeat: no-repeat;
         background-position: center;
@@ -79,38 +128,138 @@ st.title("🎟 Seat Selection System")
 # =================================
 # ====== HELPERS / UTILITIES ======
 # =================================
-def now_myt():
-    return datetime.now(MYT)
+_NORM_RE = re.compile(r"[^a-z0-9]")
+# Deletes every ASCII char except [a-z0-9] in one C-level str.translate pass
+_NORM_KEEP = set(string.ascii_lowercase + string.digits)
+_NORM_TRANS = str.maketrans("", "", "".join(chr(c) for c in range(128) if chr(c) not in _NORM_KEEP))
 
 def normalize_name(x: str) -> str:
     """Lowercase, strip, remove all spaces and special chars for flexible matching."""
-    return re.sub(r"[^a-z0-9]", "", str(x).lower())
+    s = str(x).lower()
+    if s.isascii():
+        return s.translate(_NORM_TRANS)
+    return _NORM_RE.sub("", s)  # non-ASCII (e.g. accented/CJK names) must be dropped too
+
+def to_int(x) -> int:
+    """Parse a sheet cell as int (blank or invalid -> 0)."""
+    if isinstance(x, (int, float)):
+        return int(x)  # unformatted reads return numeric cells as numbers
+    try:
+        return int(str(x).strip() or "0")
+    except ValueError:
+        return 0
 
 # =============================
 # ====== SEAT FUNCTIONS =======
 # =============================
-@st.cache_data(ttl=30)
-def get_seats():
-    """Fetch all seats (cached, for UI display)."""
-    rows = seats_ws.get_all_records()
-    records = []
-    for i, r in enumerate(rows, start=2):
-        reserved_by = str(r.get("ReservedBy", "")).strip()
-        phone = str(r.get("PhoneNo", "")).strip()
-        status = str(r.get("Status", "")).strip().lower()
-        if not reserved_by and not phone:
-            r["Status"] = "available"
-        elif status != "reserved":
-            r["Status"] = "reserved"
+@st.cache_data(ttl=60)
+def sheet_version():
+    """
+    Cheap freshness probe: the spreadsheet's Drive modifiedTime.
+    Only needed to pick up edits made directly in the sheet (admins);
+    the app's own writes invalidate at once via note_sheet_write().
+    """
+    try:
+        return sh.get_lastUpdateTime()
+    except Exception:
+        # Probe failed, fall back to a 30s time bucket
+        return int(time.time() // 30)
+
+@st.cache_resource
+def local_writes():
+    """Number of writes this process made to the sheet (shared by all sessions)."""
+    return {"n": 0}
+
+def note_sheet_write():
+    """Invalidate sheet-derived caches after this app wrote to the sheet."""
+    local_writes()["n"] += 1
+
+def current_version():
+    """
+    Cache key for sheet data: Drive modifiedTime + our own write count,
+    so our writes show up at once even before modifiedTime catches up.
+    """
+    return sheet_version(), local_writes()["n"]
+
+@st.cache_data(max_entries=2)
+def load_sheet_values(version):
+    """
+    Raw cell values of Seats and Whitelist for one sheet version,
+    fetched together in one values.batchGet.
+    Returns (seat_values, whitelist_values), each a padded list of rows.
+    Cells are unformatted: numeric cells come back as numbers, not strings.
+    """
+    resp = sh.values_batch_get(
+        [f"{SEATS_WS_NAME}!{SEATS_RANGE}", WHITELIST_WS_NAME],
+        params={"valueRenderOption": ValueRenderOption.unformatted}
+    )
+    seat_vr, wl_vr = resp.get("valueRanges", [{}, {}])
+    return fill_gaps(seat_vr.get("values", [])), fill_gaps(wl_vr.get("values", []))
+
+@st.cache_data(max_entries=4)
+def load_seats(version):
+    """
+    Fetch all seats for one sheet version (cached, for UI display).
+    Returns {"records": [...], "by_id": {SeatID: seat},
+             "sections": [Section, ...] (sorted, non-blank),
+             "available": Counter({section: free seats}),
+             "layout": {section: [[seat or None per Col] per Row]}}.
+    layout rows are sorted by Row, columns by Col descending; a section whose
+    Col values are not all numeric maps to None.
+    The None section key holds every seat (the "All Sections" view).
+    """
+    # Raw values + header zip (skips get_all_records' per-cell numericise pass)
+    values, _ = load_sheet_values(version)
+    if not values:
+        return {"records": [], "by_id": {}, "sections": [], "available": Counter(), "layout": {}}
+    headers = [str(h).strip() for h in values[0]]
+    width = len(headers)
+
+    records, by_id, grid, bad_cols = [], {}, {}, set()
+    available = Counter()
+    for i, row in enumerate(values[1:], start=2):
+        # Cells are stripped once here, so the hot paths can compare them as-is
+        r = dict(zip(headers, [str(v).strip() for v in row] + [""] * (width - len(row))))
+        r.setdefault("SeatID", "")
+        r.setdefault("ReservedBy", "")
+        # Status is derived from ReservedBy/PhoneNo (always lowercase)
+        r["Status"] = "reserved" if r["ReservedBy"] or r.get("PhoneNo") else "available"
         r["_row"] = i  # save sheet row for later update
         records.append(r)
-    return records
+
+        # O(1) lookups (first seat wins, same as a linear scan)
+        by_id.setdefault(r["SeatID"], r)
+        row_label = r.get("Row", "")
+        for key in (r.get("Section", ""), None):
+            if r["Status"] != "reserved":
+                available[key] += 1
+            g = grid.setdefault(key, {}).setdefault(row_label, {})
+            try:
+                g.setdefault(int(r.get("Col", "")), r)
+            except ValueError:
+                bad_cols.add(key)
+
+    # Section list + a dense Row x Col seat matrix per section, once per sheet version
+    sections = sorted(key for key in grid if key)
+    layout = {}
+    for key, g in grid.items():
+        if key in bad_cols:
+            layout[key] = None
+            continue
+        cols = sorted({c for cells in g.values() for c in cells}, reverse=True)
+        layout[key] = [[g[row_label].get(c) for c in cols] for row_label in sorted(g)]
+    return {"records": records, "by_id": by_id, "sections": sections,
+            "available": available, "layout": layout}
+
+def get_seats():
+    """Fetch all seats, only re-reading the sheet when its version changed."""
+    return load_seats(current_version())
 
 def get_seat_row(seat_id):
     """Fetch the latest seat status directly from Sheets for a single seat."""
     # Find the row from cached seat map (fast, local)
-    all_seats = st.session_state.get("seats_cache", [])
-    seat_info = next((s for s in all_seats if s["SeatID"] == seat_id), None)
+    by_id = st.session_state.get("seats_cache", {}).get("by_id", {})
+    seat_info = by_id.get(str(seat_id).strip())
     if not seat_info:
         return None
     
@@ -132,110 +281,229 @@ def get_seat_row(seat_id):
         "_row": row_number
     }
 
-def update_seat_atomic(seat_info, name, phone):
-    """Safely reserve a seat only if still available."""
-    row_number = seat_info["_row"]
+@st.cache_resource
+def booking_lock():
+    """Process-wide lock: one session at a time checks + writes seat statuses."""
+    return threading.Lock()
 
-    # Re-read the row to check status
-    values = seats_ws.row_values(row_number)
-    values += [""] * (7 - len(values))  # pad
-    status = values[4].strip().lower() if len(values) >= 5 else "available"
+def update_seats_bulk(seat_rows, used_cell=None, used=0, allowed=None):
+    """
+    Reserve several seats with one batched read and one batched write.
+    The read and write run under booking_lock(), so two sessions can never
+    both see a seat as available and both write it; if the lock can't be
+    taken within BOOKING_LOCK_TIMEOUT_SEC the call fails instead of waiting.
+    seat_rows = list of (row_number, seat_id, name, phone) tuples (sheet rows
+                start at 2). A row whose SeatID no longer matches (the sheet was
+                sorted or rows inserted since it was cached) counts as taken.
+    used_cell = A1 range of the user's TicketsUsed cell (e.g. "Whitelist!D5").
+                It is read in the same batch as the seats (falling back to
+                `used`) and set to that value + seats booked in the same write.
+    allowed   = ticket limit to enforce against the fresh TicketsUsed
+                (None = unlimited).
+    Returns (booked_rows, taken_rows, new_used), or (None, None, None) if the
+    sheet call failed or the quota no longer covers the free seats.
+    """
+    if not seat_rows:
+        return [], [], used
 
-    if status == "reserved":
-        return False  # someone else already took it
+    ranges = [f"{SEATS_WS_NAME}!A{r}:G{r}" for r, _, _, _ in seat_rows]
+    if used_cell:
+        ranges.append(used_cell)
 
+    # Bounded wait: a stuck holder must not block every confirm in the process
+    lock = booking_lock()
+    if not lock.acquire(timeout=BOOKING_LOCK_TIMEOUT_SEC):
+        st.error("⚠️ Booking is busy right now. Please try again.")
+        return None, None, None
     try:
-        seats_ws.update(
-            f"E{row_number}:G{row_number}",
-            [["reserved", name, phone]]
-        )
-        return True
-    except Exception as e:
-        st.error(f"⚠️ Could not update seat {seat_info['SeatID']}: {e}")
-        return False
+        # One read for every selected row (SeatID..PhoneNo) (+ TicketsUsed)
+        try:
+            value_ranges = sh.values_batch_get(
+                ranges, params={"valueRenderOption": ValueRenderOption.unformatted}
+            ).get("valueRanges", [])
+        except Exception as e:
+            st.error(f"⚠️ Could not read seats from sheet: {e}")
+            return None, None, None
+
+        if used_cell and len(value_ranges) > len(seat_rows):
+            used = to_int((value_ranges[-1].get("values") or [[""]])[0][0])
+
+        booked, taken, data = [], [], []
+        for (r, seat_id, name, phone), vr in zip(seat_rows, value_ranges):
+            values = (vr.get("values") or [[]])[0] + [""] * 7  # pad
+            sid, _, _, _, status, reserved_by, ph = (str(v).strip() for v in values[:7])
+            if sid != seat_id:
+                taken.append(r)  # row no longer holds this seat
+                continue
+            if status.lower() == "reserved" or reserved_by or ph:
+                taken.append(r)  # someone else already took it
+                continue
+            data.append({
+                "range": f"{SEATS_WS_NAME}!E{r}:G{r}",
+                "values": [["reserved", name, phone]]
+            })
+            booked.append(r)
+
+        if not booked:
+            return booked, taken, used
+
+        if allowed is not None and used + len(booked) > allowed:
+            st.error(f"You only have {max(0, allowed - used)} tickets remaining. Please deselect some seats.")
+            return None, None, None
+
+        new_used = used + len(booked)
+        update_tickets_used(data, used_cell, new_used)
+
+        # One write for all seats (+ TicketsUsed)
+        try:
+            sh.values_batch_update({"valueInputOption": "RAW", "data": data})
+        except Exception as e:
+            st.error(f"⚠️ Could not reserve seats: {e}")
+            return None, None, None
+        note_sheet_write()
+    finally:
+        lock.release()
+    return booked, taken, new_used
+
+def reserve_seats_atomic(seat_ids, name, phone, seats, used_cell=None, used=0, allowed=None):
+    """
+    Reserve `seat_ids` for one user in a single batched read + write.
+    Sheet rows come from the cached `seats` index and are checked against
+    the live SeatID in the same batched read.
+    Returns (success_ids, failed_ids, new_used), or (None, None, None) if
+    the batch failed (see update_seats_bulk).
+    """
+    seat_rows, row_to_id, failed = [], {}, []
+    for seat_id in seat_ids:
+        seat = seats["by_id"].get(seat_id)
+        if not seat:
+            failed.append(seat_id)
+            continue
+        seat_rows.append((seat["_row"], seat_id, name, phone))
+        row_to_id[seat["_row"]] = seat_id
+
+    booked_rows, taken_rows, new_used = update_seats_bulk(seat_rows, used_cell, used, allowed)
+    if booked_rows is None:
+        return None, None, None
+    failed += [row_to_id[r] for r in taken_rows]
+    return [row_to_id[r] for r in booked_rows], failed, new_used
 
 # =============================
 # ====== WHITELIST HELPERS =====
 # =============================
-@st.cache_data(ttl=10)
-def load_whitelist_all():
-    values = wl_ws.get_all_values()
+@st.cache_data(max_entries=4)
+def load_whitelist(version):
+    """
+    Parse the Whitelist for one sheet version.
+    Returns (headers, rows, hmap, norm_names, groups, by_receipt).
+    norm_names[i] = normalized sibling names of rows[i] (Name split on "/"),
+    computed once per cache refresh instead of on every login.
+    groups        = {Name: {"rows": [sheet rows], "allowed": int, "used": int}},
+                    the combined quota of each sibling group across receipts.
+    by_receipt    = {ReceiptNo: [sheet rows]} in sheet order.
+    """
+    _, values = load_sheet_values(version)
     if not values:
-        return [], [], {}
+        return [], [], {}, [], {}, {}
     headers = values[0]
     rows = values[1:]
-    hmap = {h.strip().lower(): i + 1 for i, h in enumerate(headers)}
-    return headers, rows, hmap
+    hmap = {str(h).strip().lower(): i + 1 for i, h in enumerate(headers)}
+    idx_name    = hmap.get("name")
+    idx_allowed = hmap.get("ticketsallowed")
+    idx_used    = hmap.get("ticketsused")
+    idx_rcp     = hmap.get("receiptno")
+
+    norm_names, groups, by_receipt = [], {}, {}
+    norm_by_raw = {}  # sibling groups repeat across receipts: normalize each Name once
+    for i, r in enumerate(rows, start=2):
+        raw = str(r[idx_name - 1]) if idx_name else ""
+        if raw not in norm_by_raw:
+            norm_by_raw[raw] = [normalize_name(n) for n in raw.split("/")] if idx_name else []
+        norm_names.append(norm_by_raw[raw])
+
+        # One group-by pass instead of a rescan per login
+        g = groups.setdefault(raw.strip(), {"rows": [], "allowed": 0, "used": 0})
+        g["rows"].append(i)
+        g["allowed"] += to_int(r[idx_allowed - 1]) if idx_allowed else 0
+        g["used"]    += to_int(r[idx_used - 1]) if idx_used else 0
+
+        rcp = str(r[idx_rcp - 1]).strip() if idx_rcp else ""
+        by_receipt.setdefault(rcp, []).append(i)
+    return headers, rows, hmap, norm_names, groups, by_receipt
+
+def load_whitelist_all():
+    """Whitelist for the current sheet version (see load_whitelist)."""
+    return load_whitelist(current_version())
 
 def find_whitelist_entry(name, receipt):
-    headers, rows, hmap = load_whitelist_all()
+    """Returns (row_no, entry) or (None, None); memoized per sheet version."""
+    return lookup_whitelist(normalize_name(name), str(receipt).strip(), current_version())
+
+@st.cache_data(max_entries=1000)
+def lookup_whitelist(want_name, want_rcp, version):
+    headers, rows, hmap, norm_names, groups, by_receipt = load_whitelist(version)
     if not headers:
         return None, None
     idx_name    = hmap.get("name")
-    idx_rcp     = hmap.get("receiptno")
-    idx_allowed = hmap.get("ticketsallowed")
-    idx_used    = hmap.get("ticketsused")
     idx_contact = hmap.get("contact")
 
-    want_name = normalize_name(name)
-    want_rcp  = str(receipt).strip()
-
-    for i, row in enumerate(rows, start=2):
+    # Only rows with this receipt can match (dict lookup, not a full scan)
+    for i in by_receipt.get(want_rcp, []):
+        row = rows[i - 2]
         row_name_raw = str(row[idx_name - 1]) if idx_name else ""
-        row_names = [normalize_name(n) for n in row_name_raw.split("/")]
-        r_rcp     = str(row[idx_rcp - 1]).strip() if idx_rcp else ""
 
-        # ✅ Match if typed name is inside sibling group AND receipt matches
-        if any(want_name in rn for rn in row_names) and r_rcp == want_rcp:
-            # --- Collect all rows with SAME sibling group (ignores receipt) ---
-            group_rows = [
-                (j+2, r) for j, r in enumerate(rows)
-                if str(r[idx_name - 1]).strip() == row_name_raw
-            ]
-
-            # Combine quotas across receipts
-            total_allowed = sum(int(str(r[idx_allowed - 1]).strip() or "0") for _, r in group_rows)
-            total_used    = sum(int(str(r[idx_used - 1]).strip() or "0") for _, r in group_rows)
+        # ✅ Match if typed name is inside sibling group (receipt already matches)
+        if any(want_name in rn for rn in norm_names[i - 2]):
+            # --- SAME sibling group (ignores receipt), quotas combined across receipts ---
+            group = groups[row_name_raw.strip()]
 
             entry = {
                 "Name": row_name_raw,
                 "ReceiptNo": want_rcp,
-                "TicketsAllowed": total_allowed,
-                "TicketsUsed": total_used,
+                "TicketsAllowed": group["allowed"],
+                "TicketsUsed": group["used"],
                 "Contact": row[idx_contact - 1] if idx_contact else "",
                 "Unlimited": False,
-                "GroupRows": [gr[0] for gr in group_rows]  # store row numbers for update later
+                "GroupRows": group["rows"]  # store row numbers for update later
             }
             return i, entry
     return None, None
 
-def refresh_whitelist_by_row(row_number):
-    headers, rows, hmap = load_whitelist_all()
-    if not headers or row_number is None:
+@st.cache_data(max_entries=1000)
+def get_whitelist_row(row_number, version):
+    """One whitelist row, cached on its own so reruns don't unpickle the whole sheet."""
+    if row_number is None:
         return None, None, None
+    headers, rows, hmap, _, _, _ = load_whitelist(version)
     idx = row_number - 2
-    if idx < 0 or idx >= len(rows):
+    if not headers or idx < 0 or idx >= len(rows):
         return None, None, None
     row = rows[idx]
     return headers, row, hmap
 
-def update_tickets_used(row_number, new_used, hmap):
+def refresh_whitelist_by_row(row_number):
+    return get_whitelist_row(row_number, current_version())
+
+def tickets_used_cell(row_number, hmap):
     """
-    Update the TicketsUsed column for one whitelist row.
-    row_number = row index in the sheet (starts from 2 for first data row).
-    new_used   = new tickets used value (int).
-    hmap       = header mapping dict {header: col_index}.
+    A1 range of the TicketsUsed cell for one whitelist row (e.g. "Whitelist!D5"),
+    so it can be written in the same batch as the seat changes.
+    Returns None if the column is missing.
     """
-    try:
-        col_used = hmap.get("ticketsused")
-        if not col_used:
-            st.error("⚠️ 'TicketsUsed' column not found in Whitelist sheet.")
-            return False
-        wl_ws.update_cell(row_number, col_used, str(new_used))
-        return True
-    except Exception as e:
-        st.error(f"⚠️ Could not update TicketsUsed: {e}")
-        return False
+    col_used = hmap.get("ticketsused")
+    if not col_used:
+        st.error("⚠️ 'TicketsUsed' column not found in Whitelist sheet.")
+        return None
+    return f"{WHITELIST_WS_NAME}!{rowcol_to_a1(row_number, col_used)}"
+
+def update_tickets_used(data, used_cell, new_used):
+    """
+    Queue the TicketsUsed write onto `data`, a values.batchUpdate payload
+    the caller sends together with its seat ranges (no separate API call).
+    """
+    if used_cell:
+        data.append({"range": used_cell, "values": [[new_used]]})
+    return data
 
 # =============================
 # ====== RESERVATION HELPERS ===
@@ -244,64 +512,110 @@ def get_user_reserved_seats_global(name, seats=None):
     """Return list of (row_num, SeatID) reserved under `name`."""
     if seats is None:
         seats = get_seats()
+    name = str(name).strip()
     reserved = []
-    for r in seats:
-        if str(r.get("ReservedBy", "")).strip() == str(name).strip():
-            reserved.append((r.get("_row"), str(r.get("SeatID", "")).strip()))
+    for r in seats["records"]:
+        if r["ReservedBy"] == name:
+            reserved.append((r["_row"], r["SeatID"]))
     return reserved
 
-def release_all_user_seats_global(name, seats=None):
-    """Release all seats reserved under `name` in the Seats worksheet."""
+def release_all_user_seats_global(name, seats=None, used_cell=None, used=0):
+    """
+    Release all seats reserved under `name` in the Seats worksheet.
+    Candidate rows come from `seats` (default: the shared get_seats() cache)
+    and are re-read under booking_lock(); only rows whose SeatID and
+    ReservedBy still match are released.
+    If `used_cell` is given, TicketsUsed is read in the same batch (falling
+    back to `used`) and set to that value - seats freed in the same write.
+    Returns (freed SeatIDs, new_used), or (None, None) if the sheet call failed.
+    """
     if seats is None:
         seats = get_seats()
+    name = str(name).strip()
     reserved = get_user_reserved_seats_global(name, seats)
-    ops, freed = [], []
-    for row_num, seatid in reserved:
-        ops.append({"range": f"E{row_num}", "values": [["available"]]})
-        ops.append({"range": f"F{row_num}", "values": [[""]]})
-        ops.append({"range": f"G{row_num}", "values": [[""]]})
-        freed.append(seatid)
-    if ops:
+    if not reserved:
+        return [], used
+
+    ranges = [f"{SEATS_WS_NAME}!A{r}:G{r}" for r, _ in reserved]
+    if used_cell:
+        ranges.append(used_cell)
+
+    # Same lock as confirm, so the check-and-write can't interleave with a booking
+    lock = booking_lock()
+    if not lock.acquire(timeout=BOOKING_LOCK_TIMEOUT_SEC):
+        st.error("⚠️ Booking is busy right now. Please try again.")
+        return None, None
+    try:
+        # One read for the candidate rows (+ TicketsUsed): the caches can be stale
         try:
-            seats_ws.batch_update(ops)
+            value_ranges = sh.values_batch_get(
+                ranges, params={"valueRenderOption": ValueRenderOption.unformatted}
+            ).get("valueRanges", [])
         except Exception as e:
             st.error(f"Could not release seats: {e}")
-            return []
-    return freed
+            return None, None
+
+        if used_cell and len(value_ranges) > len(reserved):
+            used = to_int((value_ranges[-1].get("values") or [[""]])[0][0])
+
+        data, freed = [], []
+        for (row_num, seatid), vr in zip(reserved, value_ranges):
+            values = (vr.get("values") or [[]])[0] + [""] * 7  # pad
+            sid, reserved_by = str(values[0]).strip(), str(values[5]).strip()
+            if sid != seatid or reserved_by != name:
+                continue  # row moved, or the seat is no longer this user's
+            data.append({
+                "range": f"{SEATS_WS_NAME}!E{row_num}:G{row_num}",
+                "values": [["available", "", ""]]
+            })
+            freed.append(seatid)
+        if not data:
+            return freed, used
+
+        new_used = max(0, used - len(freed))
+        update_tickets_used(data, used_cell, new_used)
+        try:
+            sh.values_batch_update({"valueInputOption": "RAW", "data": data})
+        except Exception as e:
+            st.error(f"Could not release seats: {e}")
+            return None, None
+        note_sheet_write()
+    finally:
+        lock.release()
+    return freed, new_used
 
 def change_seats_action():
-    """Release all seats, update whitelist usage, reset session state, rerun."""
+    """Release all seats + update whitelist usage in one write, reset session state, rerun."""
+    # Shared cache (not the session snapshot): rows are re-checked before release
     seats = get_seats()
-    freed = release_all_user_seats_global(st.session_state["user_name"], seats)
 
     # refresh whitelist row (read current sheet)
     _, row, hmap = refresh_whitelist_by_row(st.session_state.get("wl_row"))
     new_used = st.session_state.get("tickets_used", 0)
     allowed = st.session_state.get("tickets_allowed", 0)
 
+    used_cell, used = None, new_used
     if row and hmap:
-        try:
-            used = int(str(row[hmap["ticketsused"] - 1]).strip() or "0")
-        except Exception:
-            used = st.session_state.get("tickets_used", 0)
-        new_used = max(0, used - len(freed))
-        ok = update_tickets_used(st.session_state["wl_row"], new_used, hmap)
-        try:
-            allowed = int(str(row[hmap["ticketsallowed"] - 1]).strip() or "0")
-        except Exception:
-            allowed = st.session_state.get("tickets_allowed", allowed)
-    else:
-        ok = True
-
-    # Clear caches and reset session
-    try:
-        st.cache_data.clear()
-    except Exception:
-        pass
+        idx_allowed = hmap.get("ticketsallowed")
+        idx_used    = hmap.get("ticketsused")
+        used    = to_int(row[idx_used - 1]) if idx_used else used
+        allowed = to_int(row[idx_allowed - 1]) if idx_allowed else allowed
+        # Shows the "column not found" error and returns None if TicketsUsed is missing
+        used_cell = tickets_used_cell(st.session_state["wl_row"], hmap)
+
+    freed, released_used = release_all_user_seats_global(
+        st.session_state["user_name"], seats, used_cell, used
+    )
+    ok = freed is not None
+    if ok and used_cell:
+        new_used = released_used
+
+    # Reset session (release_all_user_seats_global already invalidated the sheet caches)
 
     st.session_state["confirmed"] = False
     st.session_state["selected_seats"] = []
     st.session_state["last_booked"] = []
+    st.session_state["needs_whitelist_refresh"] = True
     st.session_state["tickets_used"] = new_used
     st.session_state["tickets_allowed"] = allowed
     st.session_state["seats_cache"] = get_seats()
@@ -310,7 +624,7 @@ def change_seats_action():
         st.success("✅ Released your seats. You can now reselect seats.")
         st.rerun()
     else:
-        st.error("Released seats but failed to update ticket usage. Please contact admin.")
+        st.error("Could not release your seats. Please try again.")
         st.rerun()
 
 # ======================================
@@ -354,6 +668,7 @@ if not st.session_state["auth_ok"]:
             "unlimited": entry["Unlimited"],
             "selected_seats": [],
             "confirmed": False,
+            "needs_whitelist_refresh": True,
         })
         st.success("✅ Verified! Please review the Terms & Conditions.")
         st.rerun()
@@ -407,8 +722,7 @@ if not st.session_state["tnc_ok"]:
 # =========================
 # ===== CUTOFF CHECK ======
 # =========================
-now = now_myt()  # use your helper with timezone
-if now > CUTOFF_DATETIME:
+if time.time() > CUTOFF_TS:
     st.error(f"⛔ Seat booking has closed after {CUTOFF_DATETIME.strftime('%d %B %Y %H:%M')}.")
     st.info("You can no longer view, change, or select seats. For any changes, please contact the admin team.")
     if st.button("Logout"):
@@ -420,49 +734,29 @@ if now > CUTOFF_DATETIME:
 # ===============================
 # ===== QUOTA & SEAT FLOW ====
 # ===============================
-_, row, hmap = refresh_whitelist_by_row(st.session_state.get("wl_row"))
-if row and hmap:
-    idx_allowed = hmap.get("ticketsallowed")
-    idx_used    = hmap.get("ticketsused")
-    allowed = int(str(row[idx_allowed - 1]).strip() or "0") if idx_allowed else 0
-    used    = int(str(row[idx_used - 1]).strip() or "0") if idx_used else 0
-    remaining = (allowed - used) if not st.session_state.get("unlimited") else 10**9
-else:
-    allowed   = st.session_state.get("tickets_allowed", 0)
-    used      = st.session_state.get("tickets_used", 0)
-    remaining = (allowed - used) if not st.session_state.get("unlimited") else 10**9
+# Re-read the whitelist row only after login / change seats / a failed confirm;
+# otherwise the session copy is current (confirm stores what it wrote)
+if st.session_state.get("needs_whitelist_refresh", True):
+    _, row, hmap = refresh_whitelist_by_row(st.session_state.get("wl_row"))
+    if row and hmap:
+        idx_allowed = hmap.get("ticketsallowed")
+        idx_used    = hmap.get("ticketsused")
+        st.session_state["tickets_allowed"] = to_int(row[idx_allowed - 1]) if idx_allowed else 0
+        st.session_state["tickets_used"]    = to_int(row[idx_used - 1]) if idx_used else 0
+        st.session_state["needs_whitelist_refresh"] = False
+
+allowed   = st.session_state.get("tickets_allowed", 0)
+used      = st.session_state.get("tickets_used", 0)
+remaining = (allowed - used) if not st.session_state.get("unlimited") else 10**9
 
 if remaining <= 0:
     # User has no remaining tickets according to sheet. Show reserved seats and allow "Change Seats".
     st.error("You have already used up all your tickets. (Access locked)")
+    # Rare + cheap: re-read the row next run so tickets an admin adds unlock the page
+    st.session_state["needs_whitelist_refresh"] = True
 
-    # get seats reserved by this user (if any)
-    def get_user_reserved_seats(name):
-        rows = seats_ws.get_all_records()
-        reserved = []
-        for i, r in enumerate(rows, start=2):
-            if str(r.get("ReservedBy", "")).strip() == str(name).strip():
-                reserved.append((i, str(r.get("SeatID", "")).strip()))
-        return reserved
-
-    def release_all_user_seats(name):
-        reserved = get_user_reserved_seats(name)
-        ops = []
-        freed = []
-        for row, seatid in reserved:
-            ops.append({"range": f"E{row}", "values": [["available"]]})
-            ops.append({"range": f"F{row}", "values": [[""]]})
-            ops.append({"range": f"G{row}", "values": [[""]]})
-            freed.append(seatid)
-        if ops:
-            try:
-                seats_ws.batch_update(ops)
-            except Exception as e:
-                st.error(f"Could not release seats: {e}")
-                return []
-        return freed
-
-    reserved = get_user_reserved_seats(st.session_state["user_name"])
+    # get seats reserved by this user (if any), from the version-keyed cache
+    reserved = get_user_reserved_seats_global(st.session_state["user_name"])
     reserved_seat_ids = [s for _, s in reserved]
 
     if reserved_seat_ids:
@@ -486,26 +780,31 @@ if remaining <= 0:
     st.stop()
 
 # --- Dynamic quota (auto updates when selecting seats) ---
-quota_left = remaining - len(st.session_state["selected_seats"])
+def show_quota_box(box):
+    """Render the remaining-tickets banner into its placeholder."""
+    quota_left = remaining - len(st.session_state["selected_seats"])
+    box.markdown(
+        f"""
+        <div style="
+            background-color:#e6f2ff;
+            border:2px solid #3399ff;
+            border-radius:10px;
+            padding:15px;
+            text-align:center;
+            font-size:24px;
+            font-weight:bold;
+            color:#004080;
+            margin:20px 0;
+        ">
+            🎫 Remaining Tickets: {quota_left}
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
 
-st.markdown(
-    f"""
-    <div style="
-        background-color:#e6f2ff;
-        border:2px solid #3399ff;
-        border-radius:10px;
-        padding:15px;
-        text-align:center;
-        font-size:24px;
-        font-weight:bold;
-        color:#004080;
-        margin:20px 0;
-    ">
-        🎫 Remaining Tickets: {quota_left}
-    </div>
-    """,
-    unsafe_allow_html=True
-)
+# Placeholder so the seat picker fragment can redraw the count in place
+quota_box = st.empty()
+show_quota_box(quota_box)
 
 with st.container():
     st.markdown('<div class="block">', unsafe_allow_html=True)
@@ -519,19 +818,15 @@ with st.container():
         st.rerun()
     st.markdown('</div>', unsafe_allow_html=True)
 
-from streamlit_autorefresh import st_autorefresh
-
 # =============================
 # ===== OPENING TIME GATE =====
 # =============================
-from streamlit_autorefresh import st_autorefresh
-
-now = now_myt()
-if now < OPEN_AT:
+now_ts = time.time()
+if now_ts < OPEN_TS:
     st.warning(f"⏳ Seat selection opens at {OPEN_AT.strftime('%Y-%m-%d %H:%M:%S %Z')}")
 
     # --- JavaScript live countdown (styled like launch timer) ---
-    target_ts = int(OPEN_AT.timestamp() * 1000)
+    target_ts = int(OPEN_TS * 1000)
     countdown_html = f"""
     <div style="text-align:center; margin-top:40px;">
         <div style="font-size:40px; font-weight:bold; color:#b22222; margin-bottom:10px;">
@@ -545,8 +840,9 @@ if now < OPEN_AT:
         var now = new Date().getTime();
         var distance = target - now;
         if (distance <= 0) {{
+            // The app reruns via st_autorefresh; reloading this iframe would not
             document.getElementById("countdown").innerHTML = "🎉 OPEN!";
-            setTimeout(function() {{ location.reload(); }}, 1000);
+            clearInterval(timer);
             return;
         }}
         var days = Math.floor(distance / (1000 * 60 * 60 * 24));
@@ -562,21 +858,23 @@ if now < OPEN_AT:
 
         document.getElementById("countdown").innerHTML = text;
     }}
-    setInterval(updateCountdown, 1000);
+    var timer = setInterval(updateCountdown, 1000);
     updateCountdown();
     </script>
     """
     st.components.v1.html(countdown_html, height=200)
 
-    # --- Fallback: auto-refresh every 5s until open ---
-    remaining_sec = int((OPEN_AT - now).total_seconds())
+    # --- Server rerun only near open (countdown itself is client-side) ---
+    remaining_sec = int(OPEN_TS - now_ts)
 
-    # If more than 6s left → schedule a one-time refresh at (remaining_sec - 6) seconds
+    # If more than 6s left → schedule a one-time refresh at (remaining_sec - 6) seconds;
+    # no periodic reruns while waiting, the JS countdown covers the display
     if remaining_sec > 6:
-        st_autorefresh(interval=(remaining_sec - 6) * 1000, key="one_time_jump")
+        jump_sec = min(remaining_sec - 6, PREOPEN_MAX_REFRESH_SEC)
+        st_autorefresh(interval=jump_sec * 1000, key="one_time_jump")
 
-    # Inside last 6s → refresh every 3s
-    elif 0 < remaining_sec <= 6:
+    # Inside last 6s (including the final sub-second that truncates to 0) → refresh every 3s
+    else:
         st_autorefresh(interval=3000, key="countdown_refresh")
 
     st.info("This page will refresh once the countdown ends. Please wait...")
@@ -588,198 +886,158 @@ if now < OPEN_AT:
 st.success("🎉 Seat selection is now open! Render seat map here...")
 if "seats_cache" not in st.session_state:
     st.session_state["seats_cache"] = get_seats()
-seats = st.session_state["seats_cache"]
+seats_cache = st.session_state["seats_cache"]
+seats = seats_cache["records"]
 
 if not seats:
     st.error("No seat data found in the sheet.")
     st.stop()
 
-sections = sorted({str(s.get("Section", "")).strip() for s in seats if str(s.get("Section", "")).strip()})
-sections.insert(0, "All Sections")
-selected_section = st.selectbox("Choose Section:", sections, key="selected_section")
-
-if selected_section == "All Sections":
-    filtered_seats = seats
-else:
-    filtered_seats = [s for s in seats if str(s.get("Section", "")).strip() == selected_section]
-
-if "selected_seats" not in st.session_state:
-    st.session_state["selected_seats"] = []
-
-rows = sorted({str(s.get("Row", "")).strip() for s in filtered_seats})
-try:
-    cols = sorted({int(str(s.get("Col", "")).strip()) for s in filtered_seats}, reverse=True)
-except ValueError:
-    st.error("Column values must be numeric in 'Col' column.")
-    st.stop()
-
-# Mobile orientation tip
-st.info("📱 For best viewing on mobile, please rotate your phone to **landscape mode** while selecting seats.")
-st.subheader(f"Select Your Seat — {selected_section}")
-
-current_selected = st.session_state["selected_seats"]
-can_select_more = (len(current_selected) < remaining)
-
-for r in rows:
-    cols_ui = st.columns(len(cols))
-    for i, c in enumerate(cols):
-        seat = next(
-            (s for s in filtered_seats
-             if str(s.get("Row", "")).strip() == str(r).strip()
-             and int(str(s.get("Col", "")).strip()) == int(c)), None
-        )
-        if not seat:
-            cols_ui[i].write("")
-            continue
-        label = str(seat.get("SeatID", "")).strip()
-        status = str(seat.get("Status", "")).strip().lower()
-        is_selected = label in current_selected
-        if status == "reserved":
-            cols_ui[i].button(label, key=label, disabled=True, help="Reserved")
-        else:
-            disabled = (not is_selected) and (not can_select_more)
-            btn_label = ("✅ " if is_selected else "") + label
-            if cols_ui[i].button(btn_label, key=label, disabled=disabled):
-                if is_selected:
-                    st.session_state["selected_seats"].remove(label)
-                else:
-                    if len(st.session_state["selected_seats"]) < remaining:
-                        st.session_state["selected_seats"].append(label)
-                st.rerun()
-
-# ======================
-# ===== CONFIRM UI =====
-# ======================
-if st.session_state["selected_seats"]:
-    st.info(f"Selected seats: {', '.join(st.session_state['selected_seats'])}")
-
-    # Centered confirm button only
-    col1, col2, col3 = st.columns([3, 2, 3])
-    with col2:
-        confirm_clicked = st.button("✅ Confirm", key="confirm_btn")
-
-    if confirm_clicked:
-        # --- Refresh whitelist row (tickets allowed/used) ---
-        _, row, hmap = refresh_whitelist_by_row(st.session_state.get("wl_row"))
-        if not (row and hmap):
-            st.error("Could not verify your ticket quota. Please try again.")
-            st.stop()
-
-        allowed = int(str(row[hmap["ticketsallowed"] - 1]).strip() or "0")
-        used    = int(str(row[hmap["ticketsused"] - 1]).strip() or "0")
-        fresh_remaining = allowed - used if not st.session_state.get("unlimited") else 10**9
-
-        if len(st.session_state["selected_seats"]) > fresh_remaining:
-            st.error(f"You selected {len(st.session_state['selected_seats'])} seats but only {fresh_remaining} remaining. Please deselect some seats.")
-            st.stop()
+available = seats_cache["available"]
+if available[None] == 0:
+    st.warning("All seats have been reserved.")
+
+def toggle_seat(seat_id, limit):
+    """on_click for a seat button: add/remove it from the selection (up to `limit`)."""
+    selected = st.session_state["selected_seats"]
+    if seat_id in selected:
+        selected.remove(seat_id)
+    elif len(selected) < limit:
+        selected.append(seat_id)
+
+# Seat picking and confirm run as a fragment: a seat click only reruns this
+# block instead of the whole script (auth, quota, gate, ...)
+@st.fragment
+def seat_picker():
+    show_quota_box(quota_box)
+
+    sections = ["All Sections"] + seats_cache["sections"]
+    selected_section = st.selectbox(
+        "Choose Section:", sections, key="selected_section",
+        format_func=lambda sec: f"{sec} ({available[None if sec == 'All Sections' else sec]} available)"
+    )
+
+    if "selected_seats" not in st.session_state:
+        st.session_state["selected_seats"] = []
+
+    # Seat matrix is precomputed per section in the cached loader
+    section_key = None if selected_section == "All Sections" else selected_section
+    layout = seats_cache["layout"].get(section_key, [])
+    if layout is None:
+        st.error("Column values must be numeric in 'Col' column.")
+        st.stop()
 
-        # --- New: fetch all seats once, then check locally ---
-        # Build seat_map with sheet row numbers so we can use update_seat_atomic()
-        try:
-            all_seats = seats_ws.get_all_records()  # 1 API call
-        except Exception as e:
-            st.error(f"⚠️ Could not read seats from sheet: {e}")
-            st.stop()
+    # Mobile orientation tip
+    st.info("📱 For best viewing on mobile, please rotate your phone to **landscape mode** while selecting seats.")
+    st.subheader(f"Select Your Seat — {selected_section}")
 
-        # include _row (sheet row number) for each entry
-        seat_map = {
-            row["SeatID"]: dict(row, **{"_row": i})
-            for i, row in enumerate(all_seats, start=2)
-            if "SeatID" in row and str(row["SeatID"]).strip() != ""
-        }
-
-        success_list, failed_list = [], []
-        for seat_id in list(st.session_state["selected_seats"]):
-            latest = seat_map.get(seat_id)
-            if not latest:
-                failed_list.append(seat_id)
-                continue
+    current_selected = st.session_state["selected_seats"]
+    can_select_more = (len(current_selected) < remaining)
 
-            # Normalize the status value (some rows may have blanks)
-            s_status = str(latest.get("Status", "")).strip().lower() or "available"
-            if s_status == "reserved":
-                failed_list.append(seat_id)
+    for seat_row in layout:
+        cols_ui = st.columns(len(seat_row))
+        for i, seat in enumerate(seat_row):
+            if not seat:
+                cols_ui[i].write("")
                 continue
-
-            # Use existing atomic updater which expects seat_info with '_row'
-            ok = update_seat_atomic(latest, st.session_state["user_name"], st.session_state["contact"])
-            if ok:
-                success_list.append(seat_id)
+            label = seat["SeatID"]
+            status = seat["Status"]
+            is_selected = label in current_selected
+            if status == "reserved":
+                cols_ui[i].button(label, key=label, disabled=True, help="Reserved")
             else:
-                failed_list.append(seat_id)
+                disabled = (not is_selected) and (not can_select_more)
+                btn_label = ("✅ " if is_selected else "") + label
+                cols_ui[i].button(btn_label, key=label, disabled=disabled,
+                                  on_click=toggle_seat, args=(label, remaining))
+
+    # ======================
+    # ===== CONFIRM UI =====
+    # ======================
+    if st.session_state["selected_seats"]:
+        st.info(f"Selected seats: {', '.join(st.session_state['selected_seats'])}")
+
+        # Centered confirm button only
+        col1, col2, col3 = st.columns([3, 2, 3])
+        with col2:
+            confirm_clicked = st.button("✅ Confirm", key="confirm_btn")
 
-        if failed_list:
-            st.error("❌ Some seats were already taken: " + ", ".join(failed_list))
+        if confirm_clicked:
+            # --- Refresh whitelist row (tickets allowed/used) ---
+            _, row, hmap = refresh_whitelist_by_row(st.session_state.get("wl_row"))
+            if not (row and hmap):
+                st.error("Could not verify your ticket quota. Please try again.")
+                st.stop()
+
+            allowed = to_int(row[hmap["ticketsallowed"] - 1])
+            used    = to_int(row[hmap["ticketsused"] - 1])
+            fresh_remaining = allowed - used if not st.session_state.get("unlimited") else 10**9
+
+            if len(st.session_state["selected_seats"]) > fresh_remaining:
+                st.error(f"You selected {len(st.session_state['selected_seats'])} seats but only {fresh_remaining} remaining. Please deselect some seats.")
+                st.stop()
+
+            # --- Check seats + live TicketsUsed in one read, then reserve + bump in one write ---
+            name, contact = st.session_state["user_name"], st.session_state["contact"]
+            used_cell = tickets_used_cell(st.session_state["wl_row"], hmap)
+            success_list, failed_list, new_used = reserve_seats_atomic(
+                list(st.session_state["selected_seats"]), name, contact,
+                st.session_state["seats_cache"], used_cell, used,
+                allowed=None if st.session_state.get("unlimited") else allowed
+            )
+            if success_list is None:
+                st.session_state["needs_whitelist_refresh"] = True
+                st.error("❌ Booking failed. Please try again.")
+                st.stop()
+
+            if failed_list:
+                st.error("❌ Some seats were already taken: " + ", ".join(failed_list))
+                # This session's seat map is stale (seat taken, or rows moved in the sheet)
+                st.session_state["seats_cache"] = get_seats()
 
-        if len(success_list) == 0:
-            st.error("❌ Booking failed. Please try again.")
-            st.session_state["selected_seats"] = []
-            st.session_state["seats_cache"] = get_seats()
-            st.rerun()
+            if len(success_list) == 0:
+                st.error("❌ Booking failed. Please try again.")
+                st.session_state["selected_seats"] = []
+                st.rerun()
 
-        # --- Update tickets used immediately ---
-        new_used = min(allowed, used + len(success_list))
-        if update_tickets_used(st.session_state["wl_row"], new_used, hmap):
-            # update session state
+            # --- TicketsUsed (new_used) was written in the same batch ---
             st.session_state["confirmed"] = True
             st.session_state["selected_seats"] = []
             st.session_state["last_booked"] = success_list
             st.session_state["tickets_used"] = new_used
             st.session_state["tickets_allowed"] = allowed
 
-            # Update local cache instantly
-            for s in st.session_state["seats_cache"]:
-                if s["SeatID"] in success_list:
+            # Update local cache instantly (a reload above already has these seats)
+            if not failed_list:
+                seat_map = st.session_state["seats_cache"]["by_id"]
+                avail = st.session_state["seats_cache"]["available"]
+                for seat_id in success_list:
+                    s = seat_map[seat_id]
                     s["Status"] = "reserved"
-                    s["ReservedBy"] = st.session_state["user_name"]
-                    s["PhoneNo"] = st.session_state["contact"]
+                    s["ReservedBy"] = name
+                    s["PhoneNo"] = contact
+                    avail[s.get("Section", "")] -= 1
+                    avail[None] -= 1
 
             st.success(f"🎉 Booking confirmed! Your seats: {', '.join(success_list)}.")
             st.rerun()
-        else:
-            st.error("Booked seats but failed to update ticket usage. Contact admins.")
-            st.stop()
+
+seat_picker()
 
 # ==========================
 # ===== AFTER CONFIRM ======
 # ==========================
 if st.session_state.get("confirmed", False):
-    _, row, hmap = refresh_whitelist_by_row(st.session_state.get("wl_row"))
-    if row and hmap:
-        allowed = int(str(row[hmap["ticketsallowed"] - 1]).strip() or "0")
-        used    = int(str(row[hmap["ticketsused"] - 1]).strip() or "0")
-        rem     = allowed - used if not st.session_state.get("unlimited") else 10**9
-    else:
-        rem = 0
-
-    # helper already used earlier; re-declare locally if needed
-    def get_user_reserved_seats(name):
-        rows = seats_ws.get_all_records()
-        reserved = []
-        for i, r in enumerate(rows, start=2):
-            if str(r.get("ReservedBy", "")).strip() == str(name).strip():
-                reserved.append((i, str(r.get("SeatID", "")).strip()))
-        return reserved
-
-    def release_all_user_seats(name):
-        reserved = get_user_reserved_seats(name)
-        ops = []
-        freed = []
-        for row_num, seatid in reserved:
-            ops.append({"range": f"E{row_num}", "values": [["available"]]})
-            ops.append({"range": f"F{row_num}", "values": [[""]]})
-            ops.append({"range": f"G{row_num}", "values": [[""]]})
-            freed.append(seatid)
-        if ops:
-            try:
-                seats_ws.batch_update(ops)
-            except Exception as e:
-                st.error(f"Could not release seats: {e}")
-                return []
-        return freed
-
-    # read currently reserved seats (live from sheet)
-    reserved = get_user_reserved_seats(st.session_state["user_name"])
+    # Confirm stored the quota it just wrote (same batch as the seats), so
+    # there's no need to re-read the Whitelist here
+    allowed = st.session_state.get("tickets_allowed", 0)
+    used    = st.session_state.get("tickets_used", 0)
+    rem     = allowed - used if not st.session_state.get("unlimited") else 10**9
+
+    # Session cache was patched by the confirm/change that got us here
+    reserved = get_user_reserved_seats_global(
+        st.session_state["user_name"], st.session_state.get("seats_cache")
+    )
     reserved_ids = [s for _, s in reserved]
 
     if rem <= 0:
@@ -793,20 +1051,7 @@ if st.session_state.get("confirmed", False):
         col1, col2 = st.columns([2,1])
         with col1:
             if st.button("🔄 Change Seats"):
-                freed = release_all_user_seats(st.session_state["user_name"])
-                # update whitelist used count (reduce by number freed)
-                _, row, hmap = refresh_whitelist_by_row(st.session_state.get("wl_row"))
-                if row and hmap:
-                    used = int(str(row[hmap["ticketsused"] - 1]).strip() or "0")
-                    new_used = max(0, used - len(freed))
-                    update_tickets_used(st.session_state["wl_row"], new_used, hmap)
-                # reset session and go back to selection
-                st.session_state["confirmed"] = False
-                st.session_state["selected_seats"] = []
-                st.session_state["last_booked"] = []
-                st.session_state["seats_cache"] = get_seats()
-                st.success("Released your seats. You can now reselect seats.")
-                st.rerun()
+                change_seats_action()
         with col2:
             if st.button("Logout"):
                 for k in list(st.session_state.keys()):
@@ -823,18 +1068,7 @@ if st.session_state.get("confirmed", False):
         # Center the Change Seats button
         st.markdown("<div style='text-align:center;'>", unsafe_allow_html=True)
         if st.button("🔄 Change Seats", key="change_seats_center"):
-            freed = release_all_user_seats(st.session_state["user_name"])
-            _, row, hmap = refresh_whitelist_by_row(st.session_state.get("wl_row"))
-            if row and hmap:
-                used = int(str(row[hmap["ticketsused"] - 1]).strip() or "0")
-                new_used = max(0, used - len(freed))
-                update_tickets_used(st.session_state["wl_row"], new_used, hmap)
-            st.session_state["confirmed"] = False
-            st.session_state["selected_seats"] = []
-            st.session_state["last_booked"] = []
-            st.session_state["seats_cache"] = get_seats()
-            st.success("Released your seats. You can now reselect seats.")
-            st.rerun()
+            change_seats_action()
         st.markdown("</div>", unsafe_allow_html=True)
 
 # ==========================